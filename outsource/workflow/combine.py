@@ -1,14 +1,50 @@
 #!/usr/bin/env python
 
 import argparse
-import tempfile
 import os
-from shutil import copytree, rmtree
+from concurrent.futures import ThreadPoolExecutor
+from shutil import copy2, rmtree
 import strax
 import straxen
-from utilix import db
-from admix.interfaces.rucio_summoner import RucioSummoner
-from admix.utils.naming import make_did
+
+
+def _fast_copytree(src, dest):
+    '''
+    Like shutil.copytree, but hard links the files instead of copying them when src
+    and dest are on the same filesystem
+    '''
+    os.makedirs(dest)
+    same_fs = os.stat(src).st_dev == os.stat(os.path.dirname(os.path.abspath(dest))).st_dev
+    # scandir entries carry the file type, saving a stat() per chunk file
+    with os.scandir(src) as it:
+        for entry in it:
+            d = os.path.join(dest, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                _fast_copytree(entry.path, d)
+                continue
+            if same_fs:
+                try:
+                    os.link(entry.path, d)
+                    continue
+                except OSError:
+                    # e.g. the filesystem does not support hard links
+                    pass
+            copy2(entry.path, d)
+
+
+def merge(runid_str, keystring, plugin, st, path):
+    '''
+    Move the per-job temp data for one keystring into place and write its metadata
+    '''
+    key = strax.DataKey(runid_str, keystring, plugin.lineage)
+    saver = st.storage[0].saver(key, plugin.metadata(runid_str, keystring))
+    saver.is_forked = True
+
+    tmpdir, tmpname = os.path.split(saver.tempdirname)
+    rmtree(saver.tempdirname)
+    _fast_copytree(os.path.join(path, tmpname), saver.tempdirname)
+    saver.is_forked = True
+    saver.close()
 
 
 def main():
@@ -31,7 +67,7 @@ def main():
     output_path = args.output_path
 
     # get context
-    st = eval(f'straxen.contexts.{args.context}()')
+    st = getattr(straxen.contexts, args.context)()
     st.storage = [strax.DataDirectory(output_path)]
 
     # initialize plugin needed for processing
@@ -39,23 +75,13 @@ def main():
     st._set_plugin_config(plugin, runid_str, tolerant=False)
     plugin.setup()
 
-    # setup rucio client
-    rc = RucioSummoner()
-
-
-    for keystring in plugin.provides:
-        dirname = f"{runid_str}-{keystring}-{hash}"
-        upload_path = os.path.join(output_path, dirname)
-
-        key = strax.DataKey(runid_str, keystring, plugin.lineage)
-        saver = st.storage[0].saver(key, plugin.metadata(runid_str, keystring))
-        saver.is_forked = True
-
-        tmpdir, tmpname = os.path.split(saver.tempdirname)
-        rmtree(saver.tempdirname)
-        copytree(os.path.join(path, tmpname), saver.tempdirname)
-        saver.is_forked = True
-        saver.close()
+    # the keystrings are independent of each other, and merging them is mostly
+    # I/O, so do them concurrently
+    with ThreadPoolExecutor(max_workers=len(plugin.provides)) as executor:
+        futures = [executor.submit(merge, runid_str, keystring, plugin, st, path)
+                   for keystring in plugin.provides]
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
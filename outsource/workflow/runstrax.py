@@ -25,7 +25,7 @@ def main():
     data_dir = './data'
 
     # get context
-    st = eval(f'straxen.contexts.{args.context}()')
+    st = getattr(straxen.contexts, args.context)()
     st.storage = [strax.DataDirectory(data_dir)]
 
     runid = args.dataset
@@ -4,6 +4,7 @@ import os
 import argparse
 import datetime
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 # make sure we don't use any custom paths from e.g. pth files
 import sys
 for p in list(sys.path):
@@ -18,6 +19,59 @@ from admix.interfaces.rucio_summoner import RucioSummoner
 from admix.utils.naming import make_did
 
 
+def upload(runid, runid_str, keystring, plugin, rse):
+    '''
+    Upload the combined data for one keystring into rucio. Returns the new data entry
+    for the runDB, or None if nothing was uploaded.
+    '''
+    # one client per upload, as these run in separate threads
+    rc = RucioSummoner()
+
+    key = strax.DataKey(runid_str, keystring, plugin.lineage)
+    hash = key.lineage_hash
+    # TODO check with utilix DB call that the hashes match?
+
+    dirname = f"{runid_str}-{keystring}-{hash}"
+    upload_path = os.path.join('combined', dirname)
+
+
+    print(f"Uploading {dirname}")
+    os.listdir(upload_path)
+
+    # make a rucio DID
+    did = make_did(runid, keystring, hash)
+
+    # check if a rule already exists for this DID
+    rucio_rule = rc.GetRule(upload_structure=did)
+
+    # if not in rucio already and no rule exists, upload into rucio
+    if rucio_rule['exists']:
+        print(f"Rucio rule already exists for {did}")
+        return None
+
+    result = rc.Upload(did,
+                       upload_path,
+                       rse,
+                       lifetime=None)
+
+    # check that upload was successful
+    new_rule = rc.GetRule(upload_structure=did, rse=rse)
+
+    # TODO check number of files
+
+    new_data_dict={}
+    new_data_dict['location'] = rse
+    new_data_dict['did'] = did
+    new_data_dict['status'] = "transferred"
+    new_data_dict['host'] = "rucio-catalogue"
+    new_data_dict['type'] = keystring
+    new_data_dict['lifetime'] = new_rule['expires'],
+    new_data_dict['protocol'] = 'rucio'
+    new_data_dict['creation_time'] = datetime.datetime.utcnow().isoformat()
+    new_data_dict['checksum'] = 'shit'
+    return new_data_dict
+
+
 def main():
     parser = argparse.ArgumentParser(description="Upload combined output to rucio")
     parser.add_argument('dataset', help='Run number', type=int)
@@ -36,56 +90,30 @@ def main():
     rse = args.rse
 
     # get context
-    st = eval(f'straxen.contexts.{args.context}()')
+    st = getattr(straxen.contexts, args.context)()
     st.storage = [strax.DataDirectory(tmp_path)]
 
     plugin = st._get_plugins((dtype,), runid_str)[dtype]
 
-    rc = RucioSummoner()
-
-    for keystring in plugin.provides:
-        key = strax.DataKey(runid_str, keystring, plugin.lineage)
-        hash = key.lineage_hash
-        # TODO check with utilix DB call that the hashes match?
-
-        dirname = f"{runid_str}-{keystring}-{hash}"
-        upload_path = os.path.join('combined', dirname)
-
-
-        print(f"Uploading {dirname}")
-        os.listdir(upload_path)
-
-        # make a rucio DID
-        did = make_did(runid, keystring, hash)
-
-        # check if a rule already exists for this DID
-        rucio_rule = rc.GetRule(upload_structure=did)
-
-        # if not in rucio already and no rule exists, upload into rucio
-        if not rucio_rule['exists']:
-            result = rc.Upload(did,
-                               upload_path,
-                               rse,
-                               lifetime=None)
-
-            # check that upload was successful
-            new_rule = rc.GetRule(upload_structure=did, rse=rse)
-
-            # TODO check number of files
-
-            new_data_dict={}
-            new_data_dict['location'] = rse
-            new_data_dict['did'] = did
-            new_data_dict['status'] = "transferred"
-            new_data_dict['host'] = "rucio-catalogue"
-            new_data_dict['type'] = keystring
-            new_data_dict['lifetime'] = new_rule['expires'],
-            new_data_dict['protocol'] = 'rucio'
-            new_data_dict['creation_time'] = datetime.datetime.utcnow().isoformat()
-            new_data_dict['checksum'] = 'shit'
-            db.update_data(runid, new_data_dict)
-        else:
-            print(f"Rucio rule already exists for {did}")
+    # the transfers are network bound, so run them concurrently. The runDB updates
+    # stay on the main thread, and are done as soon as each upload finishes so they
+    # overlap with the transfers still in flight.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(upload, runid, runid_str, keystring, plugin, rse)
+                   for keystring in plugin.provides]
+        # record every upload that went through before reporting any failure - a
+        # rerun skips DIDs which already have a rule, so they would never be recorded
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                continue
+            new_data_dict = future.result()
+            if new_data_dict is not None:
+                db.update_data(runid, new_data_dict)
+
+    # report failures in submission order, independent of which finished first
+    for future in futures:
+        if future.exception() is not None:
+            raise future.exception()
 
 
 if __name__ == "__main__":